@@ -1,11 +1,31 @@
 import os
+import re
 import json
 import time
-import requests
-from bs4 import BeautifulSoup
-from openai import OpenAI
+import asyncio
+import hashlib
+import httpx
+import diskcache
+from openai import AsyncOpenAI, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+from jsonschema import Draft7Validator
 from dotenv import load_dotenv 
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
+try:
+    # selectolax 1.0 起移除了 Modest 后端（selectolax.parser 导入即报错），优先使用 lexbor 后端
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:  # 未安装 selectolax 时退回 BeautifulSoup
+        HTMLParser = None
+        from bs4 import BeautifulSoup, NavigableString
+
 # ===============================
 # 环境变量加载
 # ===============================
@@ -17,7 +37,7 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 if not API_KEY:
     raise ValueError("❌ Missing OPENAI_API_KEY in environment or .env file. Please export OPENAI_API_KEY or add it to .env file.")
 
-client = OpenAI(api_key=API_KEY)
+client = AsyncOpenAI(api_key=API_KEY)
 
 # ===============================
 # 配置
@@ -34,113 +54,535 @@ QUESTIONS = [
 INDEX_FILE = "index_table.json"
 OUTPUT_DIR = "output"
 MODEL = "gpt-4o-mini"  # 可以改为 "gpt-5" 或 "gpt-4.1"
+MODEL_FALLBACK = "gpt-4o"  # 回答未通过 schema 校验时改用更强的模型重试一次
+CACHE_DIR = ".gpt_cache"
+PAGE_CACHE_TTL = 7 * 24 * 3600  # 网页正文缓存 7 天
+CONCURRENCY = 10  # 同时处理的 app 数量（受 OpenAI 速率限制约束）
+FETCH_CONCURRENCY = 20  # 抓取阶段的并发数
+MAX_REQUESTS_PER_MINUTE = 500  # 账户 RPM 限额
+MAX_TOKENS_PER_MINUTE = 200_000  # 账户 TPM 限额
+MAX_CONTEXT_CHARS = 4000  # 发送给 GPT 的正文上限
+EXPECTED_COMPLETION_TOKENS = 2000  # 6 个答案的输出 token 预估
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# 磁盘缓存：GPT 答案按 (模型, URL, 正文, 问题) 命中；网页正文按 URL 命中并带 TTL
+cache = diskcache.Cache(CACHE_DIR)
+
+# 单个答案对象的结构（Draft-7）
+ANSWER_SCHEMA = {
+    "type": "object",
+    "required": ["meta", "reply"],
+    "properties": {
+        "meta": {"type": "object", "required": ["id", "url"]},
+        "reply": {
+            "type": "object",
+            "required": ["qid", "question", "answer", "analysis", "reference"],
+            "properties": {
+                "answer": {
+                    "type": "object",
+                    "required": ["full_answer", "simple_answer", "extended_simple_answer"],
+                    "properties": {
+                        "full_answer": {"type": "string", "minLength": 1},
+                        "simple_answer": {"type": "string", "minLength": 1},
+                        "extended_simple_answer": {
+                            "type": "object",
+                            "required": ["comment", "content"],
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+REPLY_VALIDATOR = Draft7Validator({
+    "type": "object",
+    "required": ["answers"],
+    "properties": {"answers": {"type": "array", "items": ANSWER_SCHEMA}},
+})
+
+# 问题文本开头的编号，例如 "1. Does the app ..." → "1"
+QUESTION_NUMBER_RE = re.compile(r"\s*(\d+)\.")
+
+# 统计：共调用多少次、多少次升级到 MODEL_FALLBACK
+stats = {"requests": 0, "fallbacks": 0}
+
+# 不属于正文的元素，提取文本前删除
+NOISE_SELECTOR = "script,style,noscript,nav,footer,header"
+# 块级元素：html_to_text 每个块输出一行，块内的链接、加粗等行内元素留在同一行
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "body", "br", "dd", "details", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "form", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li",
+    "main", "ol", "p", "pre", "section", "summary", "table", "tbody", "td", "tfoot", "th", "thead",
+    "tr", "ul",
+})
+HEADING_MAX_CHARS = 120  # 命中段落的上一行不超过该长度时视为小标题一并保留
+MIN_TRUNCATED_CHARS = 100  # 剩余预算不足该长度时不再截断放入长段落
+
+# 隐私相关关键词：只保留命中的段落，去掉导航、页脚等噪声
+RELEVANT_RE = re.compile(
+    r"\b(collect|share|third[- ]part|opt[- ]out|delete|retain|purpose|personal|data)",
+    re.IGNORECASE,
+)
+
+# ===============================
+# JSON 读写（优先 orjson）
+# ===============================
+def json_loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def json_dumps(obj):
+    """序列化为 UTF-8 bytes，缩进 2 空格"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+# ===============================
+# 速率限制
+# ===============================
+class RateLimiter:
+    """RPM + TPM 双令牌桶，在发请求前主动等待，避免触发 429"""
+
+    def __init__(self, max_requests_per_minute, max_tokens_per_minute):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = max_requests_per_minute
+        self.available_token_capacity = max_tokens_per_minute
+        self._last_update = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_update
+        self._last_update = now
+        self.available_request_capacity = min(
+            self.max_requests_per_minute,
+            self.available_request_capacity + self.max_requests_per_minute * elapsed / 60,
+        )
+        self.available_token_capacity = min(
+            self.max_tokens_per_minute,
+            self.available_token_capacity + self.max_tokens_per_minute * elapsed / 60,
+        )
+
+    async def acquire(self, estimated_tokens):
+        # 单次请求超过整桶容量时按满桶处理，否则会永远等待
+        estimated_tokens = min(estimated_tokens, self.max_tokens_per_minute)
+        while True:
+            async with self._lock:
+                self._refill()
+                if self.available_request_capacity >= 1 and self.available_token_capacity >= estimated_tokens:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= estimated_tokens
+                    return
+                missing_requests = max(0, 1 - self.available_request_capacity)
+                missing_tokens = max(0, estimated_tokens - self.available_token_capacity)
+                wait = max(
+                    missing_requests * 60 / self.max_requests_per_minute,
+                    missing_tokens * 60 / self.max_tokens_per_minute,
+                )
+            await asyncio.sleep(wait)
+
+limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE)
+
+@retry(
+    retry=retry_if_exception_type(RateLimitError),
+    wait=wait_random_exponential(min=1, max=60),
+    stop=stop_after_attempt(6),
+    reraise=True,
+)
+async def create_completion(estimated_tokens, **kwargs):
+    """先向限流器申请额度，再调用 OpenAI；429 时指数退避重试"""
+    await limiter.acquire(estimated_tokens)
+    return await client.chat.completions.create(**kwargs)
+
 # ===============================
 # 工具函数
 # ===============================
-def fetch_page_content(url, timeout=20):
+def _block_lines(root, children, tag_of, text_of):
+    """按块级元素把文本节点拼成行：一行对应一个段落/列表项/标题/单元格，
+    块内的行内元素（a、b、span 等）原样拼接，不会被拆成单独的行"""
+    lines, buf = [], []
+
+    def flush():
+        line = " ".join("".join(buf).split())
+        if line:
+            lines.append(line)
+        buf.clear()
+
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node is None:  # 块级元素结束标记
+            flush()
+            continue
+        tag = tag_of(node)
+        if tag is None:  # 文本节点
+            buf.append(text_of(node))
+            continue
+        if tag in BLOCK_TAGS:
+            flush()
+            stack.append(None)
+        stack.extend(reversed(list(children(node))))
+    flush()
+    return lines
+
+def html_to_text(html):
+    """提取网页可见文本，每个块级元素一行（优先使用 selectolax，比 html.parser 快一个数量级）"""
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        for tag in tree.css(NOISE_SELECTOR):
+            tag.decompose()
+        root = tree.body or tree.root
+        if root is None:
+            return ""
+        lines = _block_lines(
+            root,
+            children=lambda n: n.iter(include_text=True),
+            tag_of=lambda n: None if n.tag == "-text" else n.tag,
+            text_of=lambda n: n.text(deep=False),
+        )
+        return "\n".join(lines)
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup.select(NOISE_SELECTOR):
+        tag.decompose()
+    lines = _block_lines(
+        soup.body or soup,
+        children=lambda n: n.children,
+        tag_of=lambda n: n.name,
+        # 注释、DOCTYPE 等也是 NavigableString 的子类，只保留普通文本
+        text_of=lambda n: str(n) if type(n) is NavigableString else "",
+    )
+    return "\n".join(lines)
+
+async def fetch_page_content(http, url, timeout=20):
     """抓取网页内容（超时自动跳过）"""
+    page_key = f"page|v2|{url}"  # v2: 正文按块级元素分行，旧缓存按文本节点分行，不能混用
+    cached = cache.get(page_key)
+    if cached is not None:
+        return cached
     try:
-        resp = requests.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
+        resp = await http.get(url, timeout=timeout)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-        return soup.get_text(separator="\n", strip=True)
+        # 解析是 CPU 密集操作，放到线程里避免阻塞事件循环
+        text = await asyncio.to_thread(html_to_text, resp.text)
+        cache.set(page_key, text, expire=PAGE_CACHE_TTL)
+        return text
     except Exception as e:
         print(f"⚠️ [Fetch Error] {url} -> {e}")
         return ""
 
-def ask_gpt(app_id, app_url, app_name, question, context, timeout=120):
-    """调用 GPT 生成 JSON 答案（错误或超时自动跳过）"""
-    prompt = f"""
-You are a privacy policy expert. You are provided with {app_url}, which contains the privacy policy document for an app.
+def select_relevant_context(text, limit=MAX_CONTEXT_CHARS):
+    """按关键词筛选段落（html_to_text 每行一个块级元素）并拼接到 limit 字符；没有命中时退回原文开头。
+
+    命中段落前面的短行（通常是小标题）一并保留。先放入能完整放下的段落，
+    预算还有剩余时再把放不下的长段落截断到剩余长度，输出保持原文顺序。
+    """
+    lines = text.split("\n")
+    picked = []
+    for i, line in enumerate(lines):
+        if not RELEVANT_RE.search(line):
+            continue
+        if i > 0 and len(lines[i - 1]) <= HEADING_MAX_CHARS and (not picked or picked[-1] != i - 1):
+            picked.append(i - 1)
+        picked.append(i)
+    if not picked:
+        return text[:limit]
+
+    chosen = {}
+    size = 0
+    overflow = []
+    for i in picked:
+        if size + len(lines[i]) + 1 <= limit:
+            chosen[i] = lines[i]
+            size += len(lines[i]) + 1
+        else:
+            overflow.append(i)  # 一段很长的样板文字不能挤掉后面的相关段落，先跳过
+    for i in overflow:
+        room = limit - size - 1
+        if room < MIN_TRUNCATED_CHARS:
+            break
+        chosen[i] = lines[i][:room]
+        size += room + 1
+    return "\n".join(chosen[i] for i in sorted(chosen))
+
+def build_system_prompt(questions):
+    numbered = "\n".join(questions)
+    return f"""
+You are a privacy policy expert. The user message provides the URL, the app id and the privacy policy document for an app.
 Your task is to:
- - answer the question based on the privacy policy document,
+ - answer every question in QUESTIONS based on the privacy policy document,
  - provide references for your answers based on the section in the privacy policy document from which your answer is generated,
- - produce your results strictly in the JSON format below (no extra text beyond JSON),
- - ensure that the 'url' in the 'meta' section is exactly {app_url}.
+ - produce your results strictly in the JSON format below (no extra text beyond JSON), with one object in "answers" per question, in the same order as QUESTIONS,
+ - ensure that the 'id' and 'url' in the 'meta' section are exactly the ID and URL given in the user message.
 
 JSON format:
 {{
-   "meta": {{
-       "id": {app_id},
-       "url": "{app_url}",
-       "title": "{app_name}"
-   }},
-   "reply": {{
-       "qid": "",
-       "question": "",
-       "answer": {{
-           "full_answer": "",
-           "simple_answer": "",
-           "extended_simple_answer": {{
-               "comment": "",
-               "content": ""
+   "answers": [
+       {{
+           "meta": {{
+               "id": <ID>,
+               "url": "<URL>",
+               "title": ""
+           }},
+           "reply": {{
+               "qid": "",
+               "question": "",
+               "answer": {{
+                   "full_answer": "",
+                   "simple_answer": "",
+                   "extended_simple_answer": {{
+                       "comment": "",
+                       "content": ""
+                   }}
+               }},
+               "analysis": "",
+               "reference": ""
            }}
-       }},
-       "analysis": "",
-       "reference": ""
-   }}
+       }}
+   ]
 }}
 
-Context:
-{context[:7000]}
-Question: {question}
-Answer:
+USER MESSAGE FORMAT:
+ - Line 1: "URL: " followed by the address of the privacy policy page.
+ - Line 2: "ID: " followed by the app ID.
+ - Line 3: "CONTEXT:", followed by the text of the privacy policy document on the remaining lines.
+ - The document text was extracted from the HTML page: each line holds one paragraph, heading, list item or table cell, and scripts, navigation menus, headers and footers have been removed.
+ - Long documents are reduced to the paragraphs that mention privacy-related keywords, each kept together with the short line before it (usually its section heading), in their original order; a paragraph may be cut off at the end when the text reaches its length limit.
+
+FIELD DESCRIPTIONS:
+ - "answers": array; exactly one element per question in QUESTIONS, in the same order.
+ - "meta": object describing the document.
+   - "meta.id": the ID given in the user message (number or string, as given).
+   - "meta.url": string; the URL given in the user message.
+   - "meta.title": string; the title of the document, or an empty string.
+ - "reply": object holding the answer to one question.
+   - "reply.qid": string; the number of the question in QUESTIONS.
+   - "reply.question": string; the question text as listed in QUESTIONS.
+   - "reply.answer": object with the three forms of the answer below.
+     - "reply.answer.full_answer": string, non-empty; the answer in full sentences.
+     - "reply.answer.simple_answer": string, non-empty; a short form of the same answer.
+     - "reply.answer.extended_simple_answer": object with two string fields.
+       - "comment": string; a free-text remark on the answer, or an empty string.
+       - "content": string; additional detail for the short answer, or an empty string.
+   - "reply.analysis": string; how the answer was derived from the document.
+   - "reply.reference": string; the part of the document the answer is based on.
+
+JSON SCHEMA (draft-07) of the reply:
+{{
+  "type": "object",
+  "required": ["answers"],
+  "additionalProperties": false,
+  "properties": {{
+    "answers": {{
+      "type": "array",
+      "items": {{
+        "type": "object",
+        "required": ["meta", "reply"],
+        "additionalProperties": false,
+        "properties": {{
+          "meta": {{
+            "type": "object",
+            "required": ["id", "url", "title"],
+            "properties": {{
+              "id": {{"type": ["integer", "string"]}},
+              "url": {{"type": "string"}},
+              "title": {{"type": "string"}}
+            }}
+          }},
+          "reply": {{
+            "type": "object",
+            "required": ["qid", "question", "answer", "analysis", "reference"],
+            "additionalProperties": false,
+            "properties": {{
+              "qid": {{"type": "string"}},
+              "question": {{"type": "string"}},
+              "answer": {{
+                "type": "object",
+                "required": ["full_answer", "simple_answer", "extended_simple_answer"],
+                "additionalProperties": false,
+                "properties": {{
+                  "full_answer": {{"type": "string", "minLength": 1}},
+                  "simple_answer": {{"type": "string", "minLength": 1}},
+                  "extended_simple_answer": {{
+                    "type": "object",
+                    "required": ["comment", "content"],
+                    "additionalProperties": false,
+                    "properties": {{
+                      "comment": {{"type": "string"}},
+                      "content": {{"type": "string"}}
+                    }}
+                  }}
+                }}
+              }},
+              "analysis": {{"type": "string"}},
+              "reference": {{"type": "string"}}
+            }}
+          }}
+        }}
+      }}
+    }}
+  }}
+}}
+
+OUTPUT FORMAT:
+ - Reply with a single JSON object only: no Markdown code fences, no comments and no text before or after it.
+ - Use double quotes for all keys and strings, escape quotes and line breaks inside strings, and do not add trailing commas.
+ - Include every key shown above, even when its value is an empty string.
+
+QUESTIONS:
+{numbered}
 """
-    try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            timeout=timeout
-        )
-        text = response.choices[0].message.content.strip()
-        return json.loads(text)
-    except Exception as e:
-        print(f"⚠️ [GPT Error] {app_url} Q: {question[:30]} -> {e}")
-        return None
+
+# 固定前缀（说明 + 输入格式 + 字段说明 + JSON Schema + 问题）放在最前面，每个 app 都相同。
+# OpenAI 的自动前缀缓存要求相同前缀至少 1024 个 token，所以这里的静态部分要保持在这个长度以上
+# （当前整个 system prompt 约 5,700 字符、1,200 token 以上；删减说明时注意不要低于该阈值，否则不同 app 之间无法命中缓存）
+SYSTEM_PROMPT = build_system_prompt(QUESTIONS)
+
+async def gather_pages(http, urls, concurrency=FETCH_CONCURRENCY):
+    """并发抓取所有待处理 URL（重复 URL 只抓一次），返回 {url: 正文}"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(url):
+        async with sem:
+            return url, await fetch_page_content(http, url)
+
+    unique_urls = list(dict.fromkeys(urls))
+    return dict(await asyncio.gather(*[fetch_one(u) for u in unique_urls]))
+
+def validate_reply(data, expected_count):
+    """校验 GPT 返回的 JSON；通过返回 None，否则返回错误描述"""
+    error = next(iter(REPLY_VALIDATOR.iter_errors(data)), None)
+    if error is not None:
+        path = "/".join(str(p) for p in error.absolute_path)
+        return f"{path or '<root>'}: {error.message}"
+    if len(data["answers"]) != expected_count:
+        return f"expected {expected_count} answers, got {len(data['answers'])}"
+    return None
+
+def fill_known_fields(answers, app_id, app_url, questions):
+    """meta.id / meta.url / qid / question 都是已知值，直接写入，不依赖模型照抄"""
+    for i, (item, question) in enumerate(zip(answers, questions)):
+        item["meta"]["id"] = app_id
+        item["meta"]["url"] = app_url
+        match = QUESTION_NUMBER_RE.match(question)
+        item["reply"]["qid"] = match.group(1) if match else str(i + 1)
+        item["reply"]["question"] = question
+
+async def ask_gpt_batch(app_id, app_url, questions, context, timeout=120):
+    """一次请求回答全部问题，返回答案列表（错误或超时自动跳过）"""
+    system_prompt = SYSTEM_PROMPT if questions == QUESTIONS else build_system_prompt(questions)
+    user_prompt = f"URL: {app_url}\nID: {app_id}\nCONTEXT:\n{context[:MAX_CONTEXT_CHARS]}"
+
+    prompt_hash = hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()
+    context_hash = hashlib.sha1(context.encode("utf-8")).hexdigest()
+    key = hashlib.sha256(f"{MODEL}|{app_url}|{app_id}|{context_hash}|{prompt_hash}".encode("utf-8")).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        print(f"   💾 Cache hit for {app_url}")
+        return cached
+
+    estimated_tokens = (len(system_prompt) + len(user_prompt)) // 4 + EXPECTED_COMPLETION_TOKENS
+    stats["requests"] += 1
+    for model in (MODEL, MODEL_FALLBACK):
+        try:
+            response = await create_completion(
+                estimated_tokens,
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=0,
+                response_format={"type": "json_object"},
+                timeout=timeout
+            )
+            data = json_loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"⚠️ [GPT Error] {app_url} ({model}) -> {e}")
+            return None
+
+        error = validate_reply(data, len(questions))
+        if error is None:
+            answers = data["answers"]
+            fill_known_fields(answers, app_id, app_url, questions)
+            cache.set(key, answers)
+            return answers
+        print(f"⚠️ [Schema Error] {app_url} ({model}) -> {error}")
+        if model == MODEL:
+            stats["fallbacks"] += 1
+    return None
 
 # ===============================
 # 主流程
 # ===============================
-def main():
-    with open(INDEX_FILE, "r", encoding="utf-8") as f:
-        apps = json.load(f)
+def save_results(output_path, results):
+    """先写临时文件再 os.replace，中断时不会留下写了一半的结果文件"""
+    data = json_dumps(results)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(data)
+    os.replace(tmp_path, output_path)
 
-    for app in apps:
-        app_id = app.get("id")
-        app_url = app.get("url")
-        app_name = ""
-        output_path = os.path.join(OUTPUT_DIR, f"{app_id}.json")
+def is_done(output_path):
+    # 空文件或 "[]" 视为未完成（例如之前失败留下的文件），需要重跑
+    return os.path.exists(output_path) and os.path.getsize(output_path) > 2
 
-        if os.path.exists(output_path):
-            print(f"⏭️ Skip existing {output_path}")
-            continue
+async def process_app(app, sem, contexts):
+    """单个 app：取已抓取的正文 → 提问 → 写入结果"""
+    app_id = app.get("id")
+    app_url = app.get("url")
+    output_path = os.path.join(OUTPUT_DIR, f"{app_id}.json")
 
+    async with sem:
         print(f"\n🟡 Processing app_id={app_id} ...")
-        context = fetch_page_content(app_url)
+        context = contexts.get(app_url, "")
 
         if not context.strip():
             print(f"⚠️ No content found at {app_url}, skipping...")
+            return
+        context = select_relevant_context(context)
+
+        print(f"   → Asking {len(QUESTIONS)} questions in one request ({app_id})")
+        answers = await ask_gpt_batch(app_id, app_url, QUESTIONS, context)
+        results = [a for a in (answers or []) if isinstance(a, dict)]
+        if len(results) < len(QUESTIONS):
+            print(f"   ⚠️ Got {len(results)}/{len(QUESTIONS)} answers for {app_url}")
+
+    if results:
+        await asyncio.to_thread(save_results, output_path, results)
+        print(f"✅ Saved: {output_path}")
+    else:
+        print(f"⚠️ No valid results for {app_url}, skipping file.")
+
+async def run(apps):
+    pending = []
+    for app in apps:
+        output_path = os.path.join(OUTPUT_DIR, f"{app.get('id')}.json")
+        if is_done(output_path):
+            print(f"⏭️ Skip existing {output_path}")
             continue
+        pending.append(app)
 
-        results = []
-        for q in QUESTIONS:
-            print(f"   → Asking: {q}")
-            answer_json = ask_gpt(app_id, app_url, app_name, q, context)
-            if answer_json:
-                results.append(answer_json)
-            else:
-                print(f"   ⚠️ Skipped unanswered question: {q}")
-            time.sleep(1)
-
-        if results:
-            with open(output_path, "w", encoding="utf-8") as out:
-                json.dump(results, out, ensure_ascii=False, indent=2)
-            print(f"✅ Saved: {output_path}")
-        else:
-            print(f"⚠️ No valid results for {app_url}, skipping file.")
+    limits = httpx.Limits(max_connections=50, max_keepalive_connections=50)
+    async with httpx.AsyncClient(
+        headers={"User-Agent": "Mozilla/5.0"},
+        limits=limits,
+        follow_redirects=True,
+    ) as http:
+        print(f"🌐 Fetching {len(pending)} pages ...")
+        contexts = await gather_pages(http, [app.get("url") for app in pending])
+
+    sem = asyncio.Semaphore(CONCURRENCY)
+    await asyncio.gather(*[process_app(app, sem, contexts) for app in pending])
+
+    if stats["requests"]:
+        rate = stats["fallbacks"] / stats["requests"]
+        print(f"\n📊 {MODEL_FALLBACK} fallback: {stats['fallbacks']}/{stats['requests']} ({rate:.1%})")
+
+def main():
+    with open(INDEX_FILE, "rb") as f:
+        apps = json_loads(f.read())
+
+    asyncio.run(run(apps))
 
 if __name__ == "__main__":
     main()
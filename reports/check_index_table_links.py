@@ -15,10 +15,11 @@ Optional:
 from __future__ import annotations
 import argparse
 import asyncio
+import importlib.util
 import json
 import time
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, is_dataclass
 from typing import Optional, List
 import sys
 
@@ -28,6 +29,18 @@ except ImportError:
     print("Please install httpx first: pip install httpx", file=sys.stderr)
     sys.exit(1)
 
+from net_utils import THROTTLE_STATUSES, DNSCache, HostThrottle, env_proxies_configured, host_of, make_caching_transport
+
+try:
+    from tqdm.asyncio import tqdm as tqdm_asyncio  # type: ignore
+except ImportError:  # 未安装 tqdm 时不显示进度条
+    tqdm_asyncio = None
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
 DEFAULT_HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -50,25 +63,69 @@ class RowResult:
     elapsed_ms: Optional[float]
 
 
+def json_loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _json_default(obj):
+    if is_dataclass(obj):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(obj) -> bytes:
+    # orjson 原生支持 dataclass，不需要先逐条 asdict
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=_json_default).encode('utf-8')
+
+
+def as_completed_progress(tasks):
+    """按完成顺序迭代任务；安装了 tqdm 时显示进度条（自带刷新频率限制）。"""
+    if tqdm_asyncio is not None:
+        return tqdm_asyncio.as_completed(tasks, total=len(tasks), desc='Progress')
+    return asyncio.as_completed(tasks)
+
+
 def parse_args():
     p = argparse.ArgumentParser(description="检测 index_table_from_excel.json 中的链接")
     p.add_argument('--file', default='files/index_table_from_excel.json', help='JSON 文件路径')
     p.add_argument('--concurrency', type=int, default=20, help='并发数')
+    p.add_argument('--per-host', type=int, default=4, help='单个主机的最大并发 (遇到 429/503 自动收缩)')
     p.add_argument('--timeout', type=float, default=12.0, help='超时秒')
     p.add_argument('--retries', type=int, default=1, help='重试次数 (不含首次)')
     p.add_argument('--limit', type=int, default=None, help='仅检测前 N 条')
     p.add_argument('--output-prefix', default='reports/index_table_links_report', help='输出前缀')
-    p.add_argument('--http2', action='store_true', help='启用 HTTP/2')
+    p.add_argument('--http2', action=argparse.BooleanOptionalAction, default=True, help='启用 HTTP/2 (默认开启, --no-http2 关闭)')
     return p.parse_args()
 
 
-async def fetch_one(client: httpx.AsyncClient, _id: int, url: str, timeout: float, retries: int) -> RowResult:
+async def probe(client: httpx.AsyncClient, url: str, timeout: float) -> httpx.Response:
+    """先 HEAD；被拒绝 (405/501 或其它 >=400) 或出错（有的服务器直接断开 HEAD 连接）时
+    退回流式 GET，只读响应头不下载正文"""
+    try:
+        resp = await client.head(url, timeout=timeout, follow_redirects=True)
+        # 429/503 是限流而不是不支持 HEAD，直接交给调用方退避重试，不立刻补发 GET
+        if resp.status_code < 400 or resp.status_code in THROTTLE_STATUSES:
+            return resp
+    except httpx.HTTPError:
+        pass
+    async with client.stream('GET', url, timeout=timeout, follow_redirects=True) as resp:
+        return resp
+
+
+async def fetch_one(client: httpx.AsyncClient, _id: int, url: str, timeout: float, retries: int, throttle: HostThrottle) -> RowResult:
     attempts = 0
     last_exc = None
     start = time.perf_counter()
     while attempts <= retries:
         try:
-            resp = await client.get(url, timeout=timeout, follow_redirects=True)
+            resp = await probe(client, url, timeout)
+            # 429/503: 按 Retry-After 等待并收缩该主机并发，然后计为一次重试
+            if resp.status_code in THROTTLE_STATUSES and attempts < retries:
+                await asyncio.sleep(throttle.backoff(host_of(url), resp.headers.get('Retry-After')))
+                attempts += 1
+                continue
             elapsed = (time.perf_counter() - start) * 1000
             return RowResult(
                 id=_id,
@@ -94,31 +151,39 @@ async def fetch_one(client: httpx.AsyncClient, _id: int, url: str, timeout: floa
     )
 
 
-async def run(url_rows: List[tuple[int, str]], concurrency: int, timeout: float, retries: int, http2: bool) -> List[RowResult]:
-    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+async def run(url_rows: List[tuple[int, str]], concurrency: int, timeout: float, retries: int, http2: bool, per_host: int = 4) -> List[RowResult]:
+    # 连接池上限与并发数解耦，并保留较多 keepalive 连接供同主机复用
+    limits = httpx.Limits(max_connections=max(1000, concurrency), max_keepalive_connections=100)
+    if http2 and importlib.util.find_spec('h2') is None:
+        print("未安装 h2 (pip install 'httpx[http2]')，回退到 HTTP/1.1", file=sys.stderr)
+        http2 = False
     # 兼容 httpx 旧版本 http2 参数可能报错
     client = None
     try:
-        client = httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=timeout, limits=limits, http2=http2)
+        if env_proxies_configured():
+            # 自定义 transport 会绕过环境变量里的代理，配置了代理时使用默认 transport
+            client = httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=timeout, limits=limits, http2=http2)
+        else:
+            # 每个主机只解析一次 DNS，后续新连接直接复用缓存的地址
+            transport = make_caching_transport(DNSCache(ttl=300.0), http2=http2, limits=limits)
+            client = httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=timeout, transport=transport)
     except TypeError:
         client = httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=timeout, limits=limits)
 
     sem = asyncio.Semaphore(concurrency)
+    throttle = HostThrottle(per_host)
     results: List[RowResult] = []
 
     async def wrapped(rid: int, u: str):
-        async with sem:
-            return await fetch_one(client, rid, u, timeout, retries)
-
-    tasks = [asyncio.create_task(wrapped(rid, u)) for rid, u in url_rows]
-    done = 0
-    total = len(tasks)
-    for coro in asyncio.as_completed(tasks):
-        res = await coro
-        results.append(res)
-        done += 1
-        if done % max(1, total // 20 or 1) == 0:
-            print(f"Progress: {done}/{total} ({done/total:.0%})")
+        # 先拿主机名额再拿全局名额，等待同主机的任务不会占用全局并发
+        async with throttle.slot(host_of(u)), sem:
+            return await fetch_one(client, rid, u, timeout, retries, throttle)
+
+    # 同主机的 URL 相邻调度，HTTP/2 下可在同一连接上多路复用
+    ordered = sorted(url_rows, key=lambda row: host_of(row[1]))
+    tasks = [asyncio.create_task(wrapped(rid, u)) for rid, u in ordered]
+    for coro in as_completed_progress(tasks):
+        results.append(await coro)
     await client.aclose()
     return results
 
@@ -129,8 +194,8 @@ def write_reports(results: List[RowResult], prefix: str):
     json_path = f"{prefix}.json"
     csv_path = f"{prefix}.csv"
     # JSON
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump([asdict(r) for r in results], f, ensure_ascii=False, indent=2)
+    with open(json_path, 'wb') as f:
+        f.write(json_dumps(results))
     # CSV
     with open(csv_path, 'w', encoding='utf-8', newline='') as f:
         writer = _csv.writer(f)
@@ -160,7 +225,7 @@ def main():
         print(f"文件不存在: {file_path}")
         return 2
     try:
-        data = json.loads(file_path.read_text(encoding='utf-8', errors='ignore'))
+        data = json_loads(file_path.read_bytes())
         if not isinstance(data, list):
             print('JSON 顶层不是数组')
             return 1
@@ -182,7 +247,7 @@ def main():
         print('没有可检测的 (id,url)')
         return 0
 
-    results = asyncio.run(run(rows, args.concurrency, args.timeout, args.retries, args.http2))
+    results = asyncio.run(run(rows, args.concurrency, args.timeout, args.retries, args.http2, args.per_host))
     # 按 id 排序
     results.sort(key=lambda r: r.id)
     write_reports(results, args.output_prefix)
@@ -5,13 +5,17 @@ Batch Link Accessibility Detection Script
 =======================================
 Features:
 1. Recursively scan input files/directories (JSON, CSV, TXT, and any text files like .py/.md/.ipynb) for URLs.
+   Directory scans only read text-like suffixes (TEXT_SUFFIXES) up to 5 MB per file; plain-text files are
+   memory-mapped and matched as bytes, and files with a NUL byte in the first 4 KB are skipped as binary.
 2. Support direct URL specification via --url for single or multiple URLs.
-3. Concurrent async requests (httpx + asyncio), configurable concurrency, timeout and retry count.
+3. Concurrent async requests (aiohttp or httpx + asyncio), configurable concurrency, timeout and retry count.
 4. Automatically add common browser User-Agent for some sites to avoid 400/403.
 5. Auto fallback to GET when HEAD request fails or returns 405.
-6. Output JSON and CSV reports to reports/link_check_report_<timestamp>.{json,csv}.
+6. Stream results to reports/link_check_report_<timestamp>.{jsonl,csv} as they complete
+   (flushed every --flush-every results, --resume continues an interrupted run), then write the .json report.
 7. Display status classification statistics summary.
-8. Deduplication (default); use --allow-duplicate to keep duplicates.
+8. Exact deduplication (default); use --allow-duplicate to keep duplicates. --bloom-dedup (needs pybloom-live)
+   uses a Bloom filter instead, trading a rare silently skipped URL for less memory on huge corpora.
 
 Usage examples:
     python check_links.py --inputs files/index_table.json README.md \
@@ -22,11 +26,15 @@ Usage examples:
     # Specify custom output prefix
     python check_links.py --inputs files/ --output-prefix reports/my_run
 
-Dependencies: Only standard library + httpx (please ensure installation).
-    pip install httpx
+Dependencies: standard library + aiohttp (preferred) or httpx (please ensure one is installed).
+    pip install aiohttp        # or: pip install "httpx[http2]"
+Optional: orjson (faster JSON parsing/report writing, falls back to stdlib json),
+          ada-url (WHATWG validation of extracted URLs),
+          uvloop (faster event loop, not available on Windows),
+          pybloom-live (opt-in Bloom-filter deduplication via --bloom-dedup).
 
 Notes:
-- If parsing .ipynb is needed, it will try to load as JSON and extract text from source fields to match URLs.
+- .ipynb files are loaded as JSON and only the cells' source fields are matched (outputs and metadata are skipped).
 - JSON will recursively extract all string values to try matching URLs, no need to specify field names.
 """
 from __future__ import annotations
@@ -34,25 +42,106 @@ from __future__ import annotations
 import argparse
 import asyncio
 import csv
+import importlib.util
 import json
+import mmap
 import os
 import re
 import sys
 import time
 import traceback
-from dataclasses import dataclass, asdict
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, fields, is_dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, List, Dict, Any, Set, Optional
+from itertools import repeat
+from operator import attrgetter
+from typing import AsyncIterator, Iterable, Iterator, List, Dict, Any, Set, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+try:
+    import aiohttp  # type: ignore
+except ImportError:  # 未安装 aiohttp 时使用 httpx
+    aiohttp = None
 
 try:
     import httpx  # type: ignore
 except ImportError:
-    print("[ERROR] 未安装 httpx，请先运行: pip install httpx", file=sys.stderr)
+    httpx = None
+
+if aiohttp is None and httpx is None:
+    print("[ERROR] 未安装 aiohttp 或 httpx，请先运行: pip install aiohttp", file=sys.stderr)
     sys.exit(1)
 
+from net_utils import THROTTLE_STATUSES, CachingResolver, DNSCache, HostThrottle, env_proxies_configured, host_of, interleave_by_host, make_caching_transport
+
+try:
+    from tqdm.asyncio import tqdm as tqdm_asyncio  # type: ignore
+except ImportError:  # 未安装 tqdm 时不显示进度条
+    tqdm_asyncio = None
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
+try:
+    from pybloom_live import ScalableBloomFilter  # type: ignore
+except ImportError:  # 未安装 pybloom-live 时 --bloom-dedup 退回 set 精确去重
+    ScalableBloomFilter = None
+
+try:
+    import uvloop  # type: ignore
+except ImportError:  # 未安装 uvloop（或 Windows）时使用默认事件循环
+    uvloop = None
+
+try:
+    import ada_url  # type: ignore
+except ImportError:  # 未安装 ada-url 时只检查主机名是否为空
+    ada_url = None
+
 URL_REGEX = re.compile(r"https?://[\w\-._~:/?#@!$&'()*+,;=%]+", re.IGNORECASE)
 
+# 字节版本：非 ASCII 字节一律放行（候选区段可能偏长），解码后由 find_urls_in_buffer 按 Unicode 规则重新切分。
+# 区段边界都是两种模式下都不允许的 ASCII 字符，所以结果与对整段文本运行 URL_REGEX 相同
+URL_BYTES_REGEX = re.compile(rb"https?://[\w\-._~:/?#@!$&'()*+,;=%\x80-\xff]+", re.IGNORECASE)
+
+
+# 正则字符集允许这些字符，但出现在末尾时几乎总是句子标点或引号，而不是 URL 的一部分
+TRAILING_PUNCT = ".,;:!?'\"*"
+
+
+def trim_url(u: str) -> str:
+    """去掉末尾标点；右括号只在多于左括号时去掉（保留 wiki 风格的 .../Foo_(bar)）。"""
+    while u:
+        c = u[-1]
+        if c in TRAILING_PUNCT or (c == ')' and u.count(')') > u.count('(')):
+            u = u[:-1]
+        else:
+            break
+    return u
+
+
+def is_valid_url(u: str) -> bool:
+    if ada_url is not None:
+        return ada_url.check_url(u)
+    try:
+        parts = urlsplit(u)
+        parts.port  # 端口越界时抛出 ValueError
+        return bool(parts.hostname)
+    except ValueError:  # 例如非法端口、不完整的 IPv6
+        return False
+
+
+# 目录扫描时只读取这些文本类后缀，且跳过超过 MAX_SCAN_BYTES 的文件（图片、PDF、模型权重等不会包含可用 URL）
+TEXT_SUFFIXES = {'.txt', '.md', '.json', '.csv', '.ipynb', '.py', '.html', '.htm', '.xml', '.yml', '.yaml', '.toml', '.ini', '.cfg', '.rst'}
+MAX_SCAN_BYTES = 5 * 1024 * 1024
+BINARY_SNIFF_BYTES = 4096
+
+# 去重时忽略的跟踪参数（另外所有 utm_* 参数也会被去掉）
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_eid", "yclid"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
 DEFAULT_HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -64,6 +153,33 @@ DEFAULT_HEADERS = {
     "Pragma": "no-cache",
 }
 
+@dataclass
+class ResponseMeta:
+    """只包含状态行和响应头（不读取响应体），字段名与 httpx.Response 一致。"""
+    status_code: int
+    url: str
+    headers: Any
+
+
+class AiohttpClient:
+    """aiohttp.ClientSession 的薄包装，提供与 httpx.AsyncClient 相同的 request/aclose 接口。"""
+
+    def __init__(self, session: Any, proxy: Optional[str] = None):
+        self._session = session
+        self._proxy = proxy
+
+    async def request(self, method: str, url: str, timeout: Optional[float] = None, follow_redirects: bool = True) -> ResponseMeta:
+        kwargs: Dict[str, Any] = {'allow_redirects': follow_redirects, 'proxy': self._proxy}
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout, connect=timeout / 2)
+        # 退出 async with 时连接直接释放，响应体不会被读取
+        async with self._session.request(method, url, **kwargs) as resp:
+            return ResponseMeta(status_code=resp.status, url=str(resp.url), headers=resp.headers)
+
+    async def aclose(self):
+        await self._session.close()
+
+
 @dataclass
 class LinkResult:
     url: str
@@ -80,81 +196,239 @@ class LinkResult:
     timestamp: str
 
 
+def run_async(coro: Any) -> Any:
+    """运行顶层协程；安装了 uvloop 时使用 libuv 事件循环，大量并发 socket 时调度开销更低。"""
+    if uvloop is None:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(coro)
+    uvloop.install()
+    return asyncio.run(coro)
+
+
+def json_loads(data: str | bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _json_default(obj: Any) -> Any:
+    if is_dataclass(obj):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps_line(obj: Any) -> bytes:
+    """单行 JSON（用于 .jsonl 增量写入）。orjson 直接序列化 dataclass，无需先 asdict。"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False, default=_json_default) + '\n').encode('utf-8')
+
+
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Batch check link accessibility")
     p.add_argument("--inputs", nargs="*", default=[], help="Input files or directories, can be multiple. Supports json/csv/txt/ipynb and any text.")
     p.add_argument("--url", dest="urls", action="append", default=[], help="Directly add URLs to check, can be passed multiple times.")
     p.add_argument("--concurrency", type=int, default=20, help="Number of concurrent requests")
+    p.add_argument("--per-host", type=int, default=4, help="Max concurrent connections per host (aiohttp: connector limit_per_host; httpx: also shrinks automatically on 429/503)")
     p.add_argument("--timeout", type=float, default=15.0, help="Single request timeout (seconds)")
     p.add_argument("--retries", type=int, default=2, help="Number of retries on failure (excluding first attempt)")
     p.add_argument("--allow-duplicate", action="store_true", help="Don't filter duplicate URLs")
+    p.add_argument("--bloom-dedup", action="store_true", help="Deduplicate with a Bloom filter instead of an exact set (needs pybloom-live; slower, and a false positive, ~1 in 10,000, silently skips a URL)")
     p.add_argument("--output-prefix", default=None, help="Output file prefix (default: reports/link_check_report_<timestamp>)")
     p.add_argument("--no-head", action="store_true", help="Use GET directly, don't try HEAD first")
     p.add_argument("--jitter", type=float, default=0.0, help="Add random delay between 0~jitter seconds to ease requests")
-    p.add_argument("--http2", action="store_true", help="Enable HTTP/2 (default off, some sites are sensitive to h2 fingerprints)")
-    p.add_argument("--proxy", default=None, help="Optional HTTP/HTTPS proxy, e.g. http://127.0.0.1:7890")
+    p.add_argument("--backend", choices=("auto", "aiohttp", "httpx"), default="auto", help="HTTP client: aiohttp (default when installed, faster under high concurrency) or httpx (supports HTTP/2)")
+    p.add_argument("--http2", action=argparse.BooleanOptionalAction, default=True, help="Enable HTTP/2 with the httpx backend (default on; use --no-http2 for sites sensitive to h2 fingerprints)")
+    p.add_argument("--proxy", default=None, help="Optional HTTP/HTTPS proxy, e.g. http://127.0.0.1:7890 (HTTP_PROXY/HTTPS_PROXY env vars are also honored)")
     p.add_argument("--extract-regex", default=None, help="Custom URL regex (default built-in)")
     p.add_argument("--limit", type=int, default=None, help="Only check first N URLs for testing or debugging")
-    p.add_argument("--flush-every", type=int, default=50, help="Write incremental partial report every N completions (not implemented, reserved)")
+    p.add_argument("--flush-every", type=int, default=50, help="Flush the incremental .jsonl/.csv report to disk every N completions")
+    p.add_argument("--resume", action="store_true", help="Append to an existing <output-prefix>.jsonl and skip URLs already checked (requires --output-prefix)")
     return p.parse_args()
 
 
-def collect_urls(paths: List[str], extra_urls: List[str], allow_duplicate: bool, custom_regex: Optional[str]) -> List[str]:
-    url_pattern = re.compile(custom_regex, re.IGNORECASE) if custom_regex else URL_REGEX
+def canonicalize_url(u: str) -> str:
+    """URL 规范形式（仅作去重键）：小写 scheme/host、去默认端口、去跟踪参数、排序 query、合并路径中的 //、去掉 fragment。"""
+    try:
+        parts = urlsplit(u.strip())
+        port = parts.port
+    except ValueError:
+        return u
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if ':' in netloc:  # IPv6 字面量
+        netloc = f"[{netloc}]"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else '')
+        netloc = f"{userinfo}@{netloc}"
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    path = re.sub(r'/{2,}', '/', parts.path) or '/'
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not (k.lower().startswith('utm_') or k.lower() in TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+def find_urls(text: str, custom_regex: Optional[str] = None) -> List[str]:
+    if custom_regex:
+        return [m.group(0) for m in re.finditer(custom_regex, text, re.IGNORECASE)]
+    return clean_candidates(URL_REGEX.findall(text))
+
+
+def clean_candidates(candidates: Iterable[str]) -> List[str]:
+    """内置正则比较宽松：修剪末尾标点并丢弃无法解析的候选，避免对无效 URL 发请求。"""
+    urls = []
+    for c in candidates:
+        u = trim_url(c)
+        if is_valid_url(u):
+            urls.append(u)
+    return urls
+
+
+def find_urls_in_buffer(buf: Any) -> List[str]:
+    """在 bytes/mmap 上用字节正则找候选区段，只解码命中的片段，不把整个文件解码成 str。
+
+    纯 ASCII 片段与 str 模式的匹配结果相同，直接修剪和校验；含非 ASCII 字符的片段
+    可能跨过中文标点，才需要再用 URL_REGEX 按 Unicode 规则切分。
+    """
+    candidates: List[str] = []
+    for piece in URL_BYTES_REGEX.findall(buf):
+        if piece.isascii():
+            candidates.append(piece.decode('ascii'))
+        else:
+            candidates.extend(URL_REGEX.findall(piece.decode('utf-8', 'ignore')))
+    return clean_candidates(candidates)
+
+
+def _extract_from_json_file(path_str: str, custom_regex: Optional[str]) -> List[str]:
+    """解析 .json/.ipynb 并提取所有字符串值中的 URL。"""
+    obj = json_loads(Path(path_str).read_bytes())
+    urls: List[str] = []
+    if path_str.lower().endswith('.ipynb') and isinstance(obj, dict) and isinstance(obj.get('cells'), list):
+        # 笔记本只扫描各单元格的 source，跳过输出、图片 base64 和元数据
+        for cell in obj['cells']:
+            src = cell.get('source') if isinstance(cell, dict) else None
+            if isinstance(src, list):
+                src = ''.join(s for s in src if isinstance(s, str))
+            if isinstance(src, str):
+                urls.extend(find_urls(src, custom_regex))
+        return urls
+    # 显式栈代替递归：不受递归深度限制；逆序压栈以保持文档顺序
+    stack: List[Any] = [obj]
+    while stack:
+        o = stack.pop()
+        if isinstance(o, str):
+            urls.extend(find_urls(o, custom_regex))
+        elif isinstance(o, dict):
+            stack.extend(reversed(list(o.values())))
+        elif isinstance(o, list):
+            stack.extend(reversed(o))
+    return urls
+
+
+def _extract_from_csv_file(path_str: str, custom_regex: Optional[str]) -> List[str]:
+    urls: List[str] = []
+    with open(path_str, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+        for row in csv.reader(f):
+            for cell in row:
+                urls.extend(find_urls(cell, custom_regex))
+    return urls
+
+
+def _extract_from_text_file(path_str: str) -> List[str]:
+    """mmap 文本文件并在字节上定位 URL，不把整个文件解码成 str；前 4 KB 含 NUL 视为二进制文件跳过。"""
+    with open(path_str, 'rb') as f:
+        if b'\0' in f.read(BINARY_SNIFF_BYTES):
+            return []
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return find_urls_in_buffer(mm)
+
+
+def _scan_file(task: Tuple[str, bool], pattern_src: Optional[str]) -> Tuple[List[str], Optional[str]]:
+    """进程池 worker：按后缀解析单个文件，返回 (URL 列表, 警告信息)。
+
+    .json 只扫描字符串值，.ipynb 只扫描单元格 source，.csv 逐单元格扫描，其余按纯文本扫描。
+    目录中结构化文件解析失败时退回纯文本扫描；显式指定的文件解析失败则返回警告。
+    """
+    path_str, explicit = task
+    suffix = Path(path_str).suffix.lower()
+    try:
+        if suffix == '.json' or suffix == '.ipynb':
+            return _extract_from_json_file(path_str, pattern_src), None
+        if suffix == '.csv':
+            return _extract_from_csv_file(path_str, pattern_src), None
+    except Exception as e:
+        if explicit:
+            return [], f"[WARN] 解析文件失败 {path_str}: {e}"
+    try:
+        if pattern_src:
+            text = Path(path_str).read_text(encoding='utf-8', errors='ignore')
+            return find_urls(text, pattern_src), None
+        return _extract_from_text_file(path_str), None
+    except Exception as e:
+        return [], (f"[WARN] 解析文件失败 {path_str}: {e}" if explicit else None)
+
+
+async def collect_urls(paths: List[str], extra_urls: List[str], allow_duplicate: bool, custom_regex: Optional[str], bloom_dedup: bool = False) -> List[str]:
+    """收集 URL。先列出全部文件，再分块交给进程池并行解析，最后在主进程统一去重。"""
+    if custom_regex:
+        re.compile(custom_regex)  # 尽早暴露无效正则
     collected: List[str] = []
-    seen: Set[str] = set()
+    # 默认用 set 精确去重；--bloom-dedup 改用可扩容的布隆过滤器（纯 Python 哈希较慢，
+    # 只在 URL 数量极大、内存吃紧时使用；误判率 1e-4，被误判的 URL 会被跳过）
+    seen: Any = set()
+    if bloom_dedup:
+        if ScalableBloomFilter is None:
+            print("[WARN] 未安装 pybloom-live (pip install pybloom-live)，使用 set 精确去重", file=sys.stderr)
+        else:
+            seen = ScalableBloomFilter(initial_capacity=1_000_000, error_rate=1e-4)
 
     def add(u: str):
+        # 以规范形式去重，但保留首次出现的原始 URL 用于检测和报告
         if not allow_duplicate:
-            if u in seen:
+            key = canonicalize_url(u)
+            if key in seen:
                 return
-            seen.add(u)
+            seen.add(key)
         collected.append(u)
 
-    def extract_from_text(text: str):
-        for m in url_pattern.finditer(text):
-            add(m.group(0))
-
-    for p in paths:
-        path = Path(p)
-        if not path.exists():
-            print(f"[WARN] 输入路径不存在: {p}")
-            continue
-        if path.is_dir():
-            for sub in path.rglob('*'):
-                if sub.is_file():
+    def list_files() -> List[Tuple[str, bool]]:
+        tasks: List[Tuple[str, bool]] = []
+        for p in paths:
+            path = Path(p)
+            if not path.exists():
+                print(f"[WARN] 输入路径不存在: {p}")
+            elif path.is_dir():
+                for sub in path.rglob('*'):
+                    if sub.suffix.lower() not in TEXT_SUFFIXES or not sub.is_file():
+                        continue
                     try:
-                        text = sub.read_text(encoding='utf-8', errors='ignore')
-                    except Exception:
+                        if sub.stat().st_size > MAX_SCAN_BYTES:
+                            continue
+                    except OSError:
                         continue
-                    extract_from_text(text)
-        else:
-            suffix = path.suffix.lower()
-            try:
-                if suffix == '.json' or suffix == '.ipynb':
-                    obj = json.loads(path.read_text(encoding='utf-8', errors='ignore'))
-                    def walk(o: Any):
-                        if isinstance(o, str):
-                            extract_from_text(o)
-                        elif isinstance(o, dict):
-                            for v in o.values():
-                                walk(v)
-                        elif isinstance(o, list):
-                            for v in o:
-                                walk(v)
-                    walk(obj)
-                elif suffix == '.csv':
-                    import csv as _csv
-                    with path.open('r', encoding='utf-8', errors='ignore') as f:
-                        reader = _csv.reader(f)
-                        for row in reader:
-                            for cell in row:
-                                extract_from_text(cell)
-                else:
-                    text = path.read_text(encoding='utf-8', errors='ignore')
-                    extract_from_text(text)
-            except Exception as e:
-                print(f"[WARN] 解析文件失败 {path}: {e}")
+                    tasks.append((str(sub), False))
+            else:
+                tasks.append((str(path), True))
+        return tasks
+
+    def scan(tasks: List[Tuple[str, bool]]) -> List[Tuple[List[str], Optional[str]]]:
+        if len(tasks) <= 1:  # 单个文件不值得启动进程池
+            return [_scan_file(t, custom_regex) for t in tasks]
+        with ProcessPoolExecutor() as ex:
+            return list(ex.map(_scan_file, tasks, repeat(custom_regex), chunksize=32))
+
+    # 目录遍历和进程池调度都在线程中进行，不阻塞事件循环
+    tasks = await asyncio.to_thread(list_files)
+    for urls, warning in await asyncio.to_thread(scan, tasks):
+        if warning:
+            print(warning)
+        for u in urls:
+            add(u)
 
     for u in extra_urls:
         add(u)
@@ -162,8 +436,35 @@ def collect_urls(paths: List[str], extra_urls: List[str], allow_duplicate: bool,
     return collected
 
 
-async def fetch_url(client: httpx.AsyncClient, url: str, timeout: float, retries: int, use_head: bool, jitter: float) -> LinkResult:
+_ts_cache: List[Any] = [0, '']
+
+
+def utc_timestamp() -> str:
+    """秒级 UTC 时间戳（ISO 格式，不带时区）；同一秒内完成的结果复用同一个字符串。"""
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache[0] = now
+        _ts_cache[1] = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None).isoformat()
+    return _ts_cache[1]
+
+
+# HEAD 超时的异常类型（aiohttp 抛出 asyncio.TimeoutError，httpx 有自己的 TimeoutException）
+TIMEOUT_ERRORS: Tuple[type, ...] = (asyncio.TimeoutError,) + ((httpx.TimeoutException,) if httpx is not None else ())
+
+
+async def request_headers(client: Any, method: str, url: str, timeout: float) -> Any:
+    """只取状态行和响应头：httpx 使用流式请求，退出时直接关闭响应而不下载正文。"""
+    if isinstance(client, AiohttpClient):
+        return await client.request(method, url, timeout=timeout, follow_redirects=True)
+    async with client.stream(method, url, timeout=timeout, follow_redirects=True) as resp:
+        return ResponseMeta(status_code=resp.status_code, url=str(resp.url), headers=resp.headers)
+
+
+async def fetch_url(client: Any, url: str, timeout: float, retries: int, use_head: bool, jitter: float, throttle: HostThrottle, no_head_hosts: Optional[Set[str]] = None) -> LinkResult:
     import random
+    host = host_of(url)
+    if no_head_hosts is None:
+        no_head_hosts = set()
     attempts = 0
     method_used = 'HEAD' if use_head else 'GET'
     last_exc: Optional[Exception] = None
@@ -183,8 +484,11 @@ async def fetch_url(client: httpx.AsyncClient, url: str, timeout: float, retries
         if jitter > 0:
             await asyncio.sleep(random.random() * jitter)
         for method in methods_sequence:
+            # 该主机的 HEAD 已经失败过，直接用 GET，省掉一次往返
+            if method == 'HEAD' and host in no_head_hosts:
+                continue
             try:
-                resp = await client.request(method, url, timeout=timeout, follow_redirects=True)
+                resp = await request_headers(client, method, url, timeout)
                 status_code = resp.status_code
                 final_url = str(resp.url)
                 content_type = resp.headers.get('Content-Type')
@@ -192,8 +496,15 @@ async def fetch_url(client: httpx.AsyncClient, url: str, timeout: float, retries
                 if cl and cl.isdigit():
                     content_length = int(cl)
                 method_used = method
+                # 429/503: 按 Retry-After 等待并收缩该主机并发，然后计为一次重试；
+                # 必须先于 HEAD→GET 回退判断，限流时立刻补发 GET 只会加重限流，也不代表主机不支持 HEAD
+                if status_code in THROTTLE_STATUSES:
+                    if attempts < retries:
+                        await asyncio.sleep(throttle.backoff(host, resp.headers.get('Retry-After')))
+                        break
                 # If HEAD returns something not ok (e.g. 405) -> try GET immediately
-                if method == 'HEAD' and (status_code >= 400 or status_code == 405):
+                elif method == 'HEAD' and status_code >= 400:
+                    no_head_hosts.add(host)
                     continue  # fallthrough to GET
                 elapsed_ms = (time.perf_counter() - start) * 1000
                 category = categorize_status(status_code)
@@ -209,10 +520,12 @@ async def fetch_url(client: httpx.AsyncClient, url: str, timeout: float, retries
                     content_length=content_length,
                     retries_used=attempts,
                     method=method_used,
-                    timestamp=datetime.utcnow().isoformat(),
+                    timestamp=utc_timestamp(),
                 )
             except Exception as e:  # noqa
                 last_exc = e
+                if method == 'HEAD' and isinstance(e, TIMEOUT_ERRORS):
+                    no_head_hosts.add(host)
         attempts += 1
 
     elapsed_ms = (time.perf_counter() - start) * 1000
@@ -228,14 +541,41 @@ async def fetch_url(client: httpx.AsyncClient, url: str, timeout: float, retries
         content_length=content_length,
         retries_used=attempts - 1,
         method=method_used,
-        timestamp=datetime.utcnow().isoformat(),
+        timestamp=utc_timestamp(),
+    )
+
+
+def exception_result(url: str, e: Exception) -> LinkResult:
+    """fetch_url 之外抛出的异常（如 URL 无法解析）也落成一条结果，与其它失败 URL 一起出现在报告中。"""
+    return LinkResult(
+        url=url,
+        final_url=None,
+        status_code=None,
+        ok=False,
+        category='exception',
+        error=short_exception(e),
+        elapsed_ms=None,
+        content_type=None,
+        content_length=None,
+        retries_used=0,
+        method='',
+        timestamp=utc_timestamp(),
     )
 
 
+def hostname_of(url: str) -> Optional[str]:
+    """DNS 预解析用的主机名；URL 无法解析（如 http://[bad/x）时返回 None，留给 fetch_url 报错。"""
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+
 def short_exception(e: Optional[Exception]) -> Optional[str]:
     if not e:
         return None
-    return f"{e.__class__.__name__}: {str(e)}"[:500]
+    # 只在最终失败时格式化一次；无参数的异常不调用 str()，消息先截断再拼接
+    return type(e).__name__ + ': ' + (str(e)[:500] if e.args else '')
 
 
 def categorize_status(status: Optional[int]) -> str:
@@ -252,10 +592,49 @@ def categorize_status(status: Optional[int]) -> str:
     return 'other'
 
 
-async def run_checks(urls: List[str], concurrency: int, timeout: float, retries: int, use_head: bool, jitter: float, http2: bool, proxy: Optional[str]) -> List[LinkResult]:
-    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+async def run_checks(urls: List[str], concurrency: int, timeout: float, retries: int, use_head: bool, jitter: float, http2: bool, proxy: Optional[str], per_host: int = 4, backend: str = 'auto') -> AsyncIterator[LinkResult]:
+    """异步生成器：按完成顺序逐条产出结果，调用方可立即落盘。"""
+    use_aiohttp = backend == 'aiohttp' or (backend == 'auto' and aiohttp is not None)
+    if use_aiohttp and aiohttp is None:
+        raise RuntimeError("未安装 aiohttp，请先运行: pip install aiohttp")
+    if not use_aiohttp and httpx is None:
+        raise RuntimeError("未安装 httpx，请先运行: pip install httpx")
+
+    # 两种后端共用一个 DNS 缓存，抓取前先并发预解析全部主机
+    dns = DNSCache(ttl=600.0)
+    # --proxy 或环境变量配置了代理时由代理负责解析，也不能使用绕过代理的 DNS 缓存 transport
+    via_proxy = bool(proxy) or env_proxies_configured()
+
+    def _create_aiohttp_client() -> AiohttpClient:
+        # aiohttp 仅支持 HTTP/1.1；全局与单主机并发都由连接器限制
+        connector = aiohttp.TCPConnector(
+            limit=concurrency,
+            limit_per_host=max(1, per_host),
+            resolver=CachingResolver(dns),
+            use_dns_cache=True,
+            ttl_dns_cache=600,
+            # 保持长连接供同主机复用；清理未正常关闭的 TLS 连接（新版 Python 已修复该问题，无需开启）
+            force_close=False,
+            enable_cleanup_closed=getattr(aiohttp.connector, 'NEEDS_CLEANUP_CLOSED', True),
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers=DEFAULT_HEADERS,
+            # 与 httpx 一致读取 HTTP(S)_PROXY / NO_PROXY 环境变量；--proxy 按请求传入，优先级更高
+            trust_env=True,
+            timeout=aiohttp.ClientTimeout(total=timeout, connect=timeout / 2),
+        )
+        return AiohttpClient(session, proxy=proxy)
+
+    if not use_aiohttp and http2 and importlib.util.find_spec('h2') is None:
+        print("[WARN] 未安装 h2 (pip install 'httpx[http2]')，回退到 HTTP/1.1", file=sys.stderr)
+        http2 = False
 
-    async def _create_client() -> httpx.AsyncClient:
+    async def _create_client() -> Any:
+        if use_aiohttp:
+            return _create_aiohttp_client()
+        # 每个 worker 都能保留一条空闲连接，整个运行期间复用同一个 client；空闲 30 秒后关闭
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency, keepalive_expiry=30.0)
         base_kwargs = dict(
             headers=DEFAULT_HEADERS,
                 timeout=httpx.Timeout(timeout, connect=timeout/2, read=timeout, write=timeout, pool=timeout),
@@ -272,6 +651,14 @@ async def run_checks(urls: List[str], concurrency: int, timeout: float, retries:
                     return httpx.AsyncClient(**kw)
                 except TypeError:
                     continue
+        # 无代理时使用带 DNS 缓存的 transport，每个主机只解析一次
+        if not via_proxy:
+            try:
+                transport = make_caching_transport(dns, http2=http2, limits=limits)
+                kw = {k: v for k, v in base_kwargs.items() if k not in ('http2', 'limits')}
+                return httpx.AsyncClient(transport=transport, **kw)
+            except TypeError:
+                pass
         # 如果 http2 不被支持（极老版本），再次降级尝试
         try:
             return httpx.AsyncClient(**base_kwargs)
@@ -279,81 +666,190 @@ async def run_checks(urls: List[str], concurrency: int, timeout: float, retries:
             base_kwargs.pop("http2", None)
             return httpx.AsyncClient(**base_kwargs)
 
-    client = await _create_client()
+    # 固定数量的 worker 从队列取 URL：任务对象数量为 O(concurrency) 而不是 O(URL 数)
+    n_workers = max(1, min(concurrency, len(urls)))
+    workers: List[asyncio.Task] = []
+    client = None
+    progress = tqdm_asyncio(total=len(urls), desc='Progress') if tqdm_asyncio is not None else None
     try:
-        sem = asyncio.Semaphore(concurrency)
-
-        async def bounded(u: str):
-            async with sem:
-                return await fetch_url(client, u, timeout, retries, use_head, jitter)
-
-        tasks = [asyncio.create_task(bounded(u)) for u in urls]
-        results: List[LinkResult] = []
-        done_count = 0
-        total = len(tasks)
-        for coro in asyncio.as_completed(tasks):
-            res = await coro
-            results.append(res)
-            done_count += 1
-            if done_count % max(1, total // 20 or 1) == 0:
-                print(f"Progress: {done_count}/{total} ({done_count/total:.0%})")
-        return results
+        client = await _create_client()
+        if not via_proxy:  # 走代理时由代理负责解析，预解析没有意义
+            await dns.warm(hostname_of(u) for u in urls)
+        throttle = HostThrottle(per_host)
+        no_head_hosts: Set[str] = set()  # 本次运行中 HEAD 返回 >=400 或超时的主机
+        todo: asyncio.Queue = asyncio.Queue()
+        done: asyncio.Queue = asyncio.Queue()
+        # 按主机轮询交错入队：单主机并发受 --per-host 限制，若同主机 URL 相邻，
+        # worker 会排队等同一个主机的名额（队头阻塞），其它主机反而空闲
+        for u in interleave_by_host(urls):
+            todo.put_nowait(u)
+        for _ in range(n_workers):
+            todo.put_nowait(None)  # 每个 worker 一个结束哨兵
+
+        async def worker():
+            while True:
+                u = await todo.get()
+                if u is None:
+                    return
+                try:
+                    if use_aiohttp:
+                        # 连接器已按 limit_per_host 排队，这里只需遵守 429/503 的退避
+                        await throttle.wait(host_of(u))
+                        item = await fetch_url(client, u, timeout, retries, use_head, jitter, throttle, no_head_hosts)
+                    else:
+                        async with throttle.slot(host_of(u)):
+                            item = await fetch_url(client, u, timeout, retries, use_head, jitter, throttle, no_head_hosts)
+                except Exception as e:  # noqa  如无法解析的 URL：记为该 URL 的异常结果，不中断整个运行
+                    item = exception_result(u, e)
+                done.put_nowait(item)
+                if progress is not None:
+                    progress.update(1)
+
+        workers = [asyncio.create_task(worker()) for _ in range(n_workers)]
+        for _ in range(len(urls)):
+            yield await done.get()
     finally:
-        await client.aclose()
-
+        # 调用方提前停止（如 Ctrl-C）时取消剩余 worker
+        for t in workers:
+            t.cancel()
+        if progress is not None:
+            progress.close()
+        if client is not None:
+            await client.aclose()
 
-def write_reports(results: List[LinkResult], output_prefix: str):
-    out_dir = Path(output_prefix).parent
-    print(f"[DEBUG] 准备创建输出目录: {out_dir}")
-    os.makedirs(out_dir, exist_ok=True)
-    print(f"[DEBUG] 输出目录存在: {out_dir.exists()} 绝对路径: {out_dir.resolve()}")
-    json_path = f"{output_prefix}.json"
-    csv_path = f"{output_prefix}.csv"
 
-    # JSON
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump([asdict(r) for r in results], f, ensure_ascii=False, indent=2)
+class ReportWriter:
+    """边检测边写入 <prefix>.jsonl 与 <prefix>.csv，中断时已完成的结果不会丢失。"""
 
-    # CSV
-    fieldnames = list(asdict(results[0]).keys()) if results else []
-    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for r in results:
-            writer.writerow(asdict(r))
+    def __init__(self, output_prefix: str, resume: bool = False):
+        out_dir = Path(output_prefix).parent
+        os.makedirs(out_dir, exist_ok=True)
+        self.jsonl_path = f"{output_prefix}.jsonl"
+        self.csv_path = f"{output_prefix}.csv"
+        mode = 'a' if resume else 'w'
+        if resume:
+            truncate_partial_line(self.jsonl_path)
+        write_header = not (resume and os.path.exists(self.csv_path) and os.path.getsize(self.csv_path) > 0)
+        self._jsonl = open(self.jsonl_path, mode + 'b')
+        self._csv_file = open(self.csv_path, mode, encoding='utf-8', newline='')
+        # 列表行的 csv.writer 比 DictWriter 快：不用逐行按字段名查字典，也不需要 asdict
+        fieldnames = [f.name for f in fields(LinkResult)]
+        self._row = attrgetter(*fieldnames)
+        self._csv = csv.writer(self._csv_file)
+        if write_header:
+            self._csv.writerow(fieldnames)
+        self.count = 0
+
+    def write(self, res: LinkResult):
+        self._jsonl.write(json_dumps_line(res))
+        self._csv.writerow(self._row(res))
+        self.count += 1
+
+    def flush(self):
+        self._jsonl.flush()
+        self._csv_file.flush()
+
+    def close(self):
+        self._jsonl.close()
+        self._csv_file.close()
+
+
+def write_partial(writer: ReportWriter):
+    """把已完成的结果刷到磁盘，避免长时间运行中断没有结果。"""
+    try:
+        writer.flush()
+        print(f"[DEBUG] 已写入增量 partial: {writer.jsonl_path} (共 {writer.count} 条)")
+    except Exception as e:
+        print(f"[WARN] 写入 partial 失败: {e}")
+
+
+def truncate_partial_line(path: str):
+    """截掉 .jsonl 末尾不完整的一行（上次运行在写入中途被杀时留下），续跑时新记录才不会接在半行后面。"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r+b') as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        # 从末尾按块向前找最后一个换行符
+        while pos > 0:
+            step = min(pos, 64 * 1024)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            if pos == end and chunk.endswith(b'\n'):
+                return
+            idx = chunk.rfind(b'\n')
+            if idx >= 0:
+                pos = pos - step + idx + 1
+                break
+            pos -= step
+        print(f"[WARN] {path} 末尾有不完整的记录 ({end - pos} 字节)，已截断", file=sys.stderr)
+        f.truncate(pos)
+
+
+def iter_jsonl_lines(path: str) -> Iterator[bytes]:
+    """逐行读取 .jsonl 中的完整记录；每条记录都以换行结尾，没有换行的末行是写入中断留下的半行，跳过。"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                print(f"[WARN] 跳过 {path} 末尾不完整的记录 ({len(line)} 字节)", file=sys.stderr)
+                break
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    for line in iter_jsonl_lines(path):
+        try:
+            yield json_loads(line)
+        except ValueError as e:  # orjson/json 的 JSONDecodeError 都是 ValueError 子类
+            print(f"[WARN] 跳过 {path} 中无法解析的记录: {e}", file=sys.stderr)
 
-    print(f"[OK] 报告已生成:\n  JSON: {json_path}\n  CSV : {csv_path}")
 
+def write_reports(output_prefix: str):
+    """由 .jsonl 流式生成 JSON 数组报告（逐行转写，不在内存中构建完整列表）。"""
+    jsonl_path = f"{output_prefix}.jsonl"
+    json_path = f"{output_prefix}.json"
+    csv_path = f"{output_prefix}.csv"
+    with open(json_path, 'wb') as out:
+        out.write(b'[')
+        first = True
+        for line in iter_jsonl_lines(jsonl_path):
+            out.write(b'\n  ' if first else b',\n  ')
+            out.write(line)
+            first = False
+        out.write(b'\n]\n' if not first else b']\n')
 
-    def write_partial(results: List[LinkResult], output_prefix: str):
-        """写入 partial 报告，避免长时间运行中断没有结果。"""
-        out_dir = Path(output_prefix).parent
-        out_dir.mkdir(parents=True, exist_ok=True)
-        part_path = f"{output_prefix}_partial.json"
-        try:
-            with open(part_path, 'w', encoding='utf-8') as f:
-                json.dump([asdict(r) for r in results], f, ensure_ascii=False, indent=2)
-            print(f"[DEBUG] 已写入增量 partial: {part_path} (共 {len(results)} 条)")
-        except Exception as e:
-            print(f"[WARN] 写入 partial 失败: {e}")
+    print(f"[OK] 报告已生成:\n  JSON : {json_path}\n  JSONL: {jsonl_path}\n  CSV  : {csv_path}")
 
 
-def print_summary(results: List[LinkResult]):
+def print_summary(records: Iterable[Dict[str, Any]]):
     from collections import Counter
-    counter = Counter(r.category for r in results)
-    total = len(results)
-    ok_count = sum(1 for r in results if r.ok)
+    counter: Counter = Counter()
+    total = 0
+    ok_count = 0
+    failures: List[Dict[str, Any]] = []
+    for r in records:
+        total += 1
+        counter[r.get('category')] += 1
+        if r.get('ok'):
+            ok_count += 1
+        elif len(failures) < 10:
+            failures.append(r)
     print("\n===== 汇总 =====")
     print(f"总数: {total}")
+    if not total:
+        return
     print(f"成功(ok): {ok_count}  ({ok_count/total:.1%})")
-    for k in sorted(counter.keys()):
+    for k in sorted(counter.keys(), key=str):
         print(f"{k}: {counter[k]}")
     # 列出失败示例
-    failures = [r for r in results if not r.ok][:10]
     if failures:
         print("\n前 10 个失败示例:")
         for r in failures:
-            print(f" - {r.url} | status={r.status_code} | err={r.error}")
+            print(f" - {r.get('url')} | status={r.get('status_code')} | err={r.get('error')}")
 
 
 def main():
@@ -361,8 +857,11 @@ def main():
     if not args.inputs and not args.urls:
         print("[ERROR] 请至少提供 --inputs 或 --url")
         return 2
+    if args.resume and not args.output_prefix:
+        print("[ERROR] --resume 需要同时指定 --output-prefix")
+        return 2
 
-    urls = collect_urls(args.inputs, args.urls, args.allow_duplicate, args.extract_regex)
+    urls = run_async(collect_urls(args.inputs, args.urls, args.allow_duplicate, args.extract_regex, args.bloom_dedup))
     if not urls:
         print("[WARN] 未收集到 URL")
         return 0
@@ -377,31 +876,46 @@ def main():
         ts = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_prefix = f"reports/link_check_report_{ts}"
 
+    if args.resume:
+        done_urls = {r.get('url') for r in iter_jsonl(f"{output_prefix}.jsonl")}
+        if done_urls:
+            urls = [u for u in urls if u not in done_urls]
+            print(f"[DEBUG] --resume: 跳过已完成 {len(done_urls)} 条，剩余 {len(urls)} 条")
+
+    writer = ReportWriter(output_prefix, resume=args.resume)
+    flush_every = max(1, args.flush_every)
+
+    async def _consume():
+        async for res in run_checks(
+                urls=urls,
+                concurrency=args.concurrency,
+                timeout=args.timeout,
+                retries=args.retries,
+                use_head=not args.no_head,
+                jitter=args.jitter,
+                http2=args.http2,
+                proxy=args.proxy,
+                per_host=args.per_host,
+                backend=args.backend,
+            ):
+            writer.write(res)
+            if writer.count % flush_every == 0:
+                write_partial(writer)
+
     try:
         print("[DEBUG] 开始执行异步检测 ...")
-        results = asyncio.run(
-            run_checks(
-                    urls=urls,
-                    concurrency=args.concurrency,
-                    timeout=args.timeout,
-                    retries=args.retries,
-                    use_head=not args.no_head,
-                    jitter=args.jitter,
-                    http2=args.http2,
-                    proxy=args.proxy,
-                )
-        )
-        print(f"[DEBUG] 异步检测完成，结果数: {len(results)}")
+        run_async(_consume())
+        print(f"[DEBUG] 异步检测完成，结果数: {writer.count}")
     except KeyboardInterrupt:
-        print("\n[WARN] 用户中断，已收集部分结果。")
-        results = []
+        print(f"\n[WARN] 用户中断，已保存部分结果 {writer.count} 条。")
     except Exception:
         print("[ERROR] 运行过程中发生异常:\n" + traceback.format_exc())
         return 1
+    finally:
+        writer.close()
 
-    write_reports(results, output_prefix)
-    print(f"[DEBUG] 结果数量: {len(results)} 即将打印汇总")
-    print_summary(results)
+    write_reports(output_prefix)
+    print_summary(iter_jsonl(writer.jsonl_path))
     return 0
 
 
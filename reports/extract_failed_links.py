@@ -15,9 +15,21 @@ Arguments:
 """
 from __future__ import annotations
 import argparse, json, csv, sys, os
+from contextlib import ExitStack
 from pathlib import Path
 from typing import List
 
+SLIM_FIELDS = ['id', 'url', 'final_url', 'status_code', 'error']
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
+
+def json_loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 
 def parse_args():
     p = argparse.ArgumentParser(description="Extract failed links")
@@ -27,13 +39,18 @@ def parse_args():
     return p.parse_args()
 
 
+def json_dumps_indented(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+
 def load_report(path: Path):
     if not path.exists():
         print(f"[ERROR] 报告文件不存在: {path}")
         sys.exit(2)
     try:
-        with path.open('r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = json_loads(path.read_bytes())
         if not isinstance(data, list):
             print('[ERROR] 报告 JSON 顶层不是数组')
             sys.exit(3)
@@ -55,33 +72,26 @@ def write_outputs(failed: List[dict], prefix: str):
     csv_path = Path(prefix + '.csv')
     md_path = Path(prefix + '.md')
 
-    # 精简数据: 只保留 id,url,status_code,error,final_url
-    slim = []
-    for r in failed:
-        slim.append({
-            'id': r.get('id'),
-            'url': r.get('url'),
-            'final_url': r.get('final_url'),
-            'status_code': r.get('status_code'),
-            'error': r.get('error'),
-        })
-
-    with json_path.open('w', encoding='utf-8') as f:
-        json.dump(slim, f, ensure_ascii=False, indent=2)
-
-    with csv_path.open('w', encoding='utf-8', newline='') as f:
-        w = csv.writer(f)
-        w.writerow(['id','url','final_url','status_code','error'])
-        for r in slim:
-            w.writerow([r['id'], r['url'], r['final_url'], r['status_code'], (r['error'] or '')])
-
-    with md_path.open('w', encoding='utf-8') as f:
-        f.write('# Failed Links\n\n')
-        f.write(f'Total Failed: {len(slim)}\n\n')
-        f.write('| id | status | url | error |\n|----|--------|-----|-------|\n')
-        for r in slim:
-            err_short = (r['error'] or '')[:100].replace('\n',' ')
-            f.write(f"| {r['id']} | {r['status_code']} | {r['url']} | {err_short} |\n")
+    # 单次遍历：每条记录只精简一次，同时写入 JSON / CSV / Markdown 三个文件
+    with ExitStack() as stack:
+        f_json = stack.enter_context(json_path.open('wb'))
+        f_csv = stack.enter_context(csv_path.open('w', encoding='utf-8', newline=''))
+        f_md = stack.enter_context(md_path.open('w', encoding='utf-8'))
+        w = csv.writer(f_csv)
+        w.writerow(SLIM_FIELDS)
+        f_md.write('# Failed Links\n\n')
+        f_md.write(f'Total Failed: {len(failed)}\n\n')
+        f_md.write('| id | status | url | error |\n|----|--------|-----|-------|\n')
+        f_json.write(b'[')
+        for i, r in enumerate(failed):
+            # 精简数据: 只保留 id,url,status_code,error,final_url
+            d = {k: r.get(k) for k in SLIM_FIELDS}
+            f_json.write(b',\n  ' if i else b'\n  ')
+            f_json.write(json_dumps_indented(d).replace(b'\n', b'\n  '))
+            w.writerow([d['id'], d['url'], d['final_url'], d['status_code'], (d['error'] or '')])
+            err_short = (d['error'] or '')[:100].replace('\n',' ')
+            f_md.write(f"| {d['id']} | {d['status_code']} | {d['url']} | {err_short} |\n")
+        f_json.write(b'\n]' if failed else b']')
 
     print('[OK] 失败报告已生成:')
     print('  JSON:', json_path)
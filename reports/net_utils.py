@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Shared networking helpers for check_links.py and check_index_table_links.py.
+
+- interleave_by_host: round-robin URLs across hosts so per-host caps never block the whole pool.
+- HostThrottle: per-host concurrency cap with adaptive backoff on 429/503
+  (honors Retry-After and shrinks the host's slots after each throttle response).
+  wait() applies only the backoff, for clients whose pool already caps per-host connections.
+- DNSCache + make_caching_transport / CachingResolver: resolve each host once per run and
+  reuse the addresses for every new connection opened by httpx or aiohttp.
+  The httpx transport bypasses proxy environment variables, so callers skip it when
+  env_proxies_configured() is true.
+  Uses aiodns when installed, otherwise the event loop's getaddrinfo.
+  DNSCache.warm() pre-resolves all hosts concurrently before fetching starts.
+"""
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import socket
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from itertools import zip_longest
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.request import getproxies
+
+try:
+    import aiodns  # type: ignore
+except ImportError:  # 未安装 aiodns 时使用 loop.getaddrinfo
+    aiodns = None
+
+try:
+    import httpx  # type: ignore
+    import httpcore  # type: ignore
+except ImportError:
+    httpx = None
+    httpcore = None
+
+try:
+    import aiohttp  # type: ignore
+    from aiohttp.abc import AbstractResolver  # type: ignore
+except ImportError:
+    aiohttp = None
+    AbstractResolver = None
+
+# 触发退避的状态码
+THROTTLE_STATUSES = (429, 503)
+
+
+def host_of(url: str) -> str:
+    """按主机分组/限流用的键；URL 无法解析时返回空串，错误留给真正请求时按单个 URL 报告。"""
+    try:
+        return urlsplit(url).netloc.lower()
+    except ValueError:
+        return ''
+
+
+def interleave_by_host(urls: Iterable[str]) -> List[str]:
+    """按主机分组后轮询交错：相邻 URL 尽量来自不同主机，慢主机不会占满全部 worker。"""
+    groups: Dict[str, List[str]] = {}
+    for u in urls:
+        groups.setdefault(host_of(u), []).append(u)
+    return [u for batch in zip_longest(*groups.values()) for u in batch if u is not None]
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0, cap: float = 60.0) -> float:
+    """解析 Retry-After（秒数或 HTTP 日期），结果限制在 [0, cap] 秒。"""
+    if not value:
+        return default
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), cap)
+    try:
+        delay = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return default
+    return min(max(delay, 0.0), cap)
+
+
+class HostThrottle:
+    """每个主机独立的并发名额；收到 429/503 时暂停该主机并减少其名额（不低于 min_per_host）。"""
+
+    def __init__(self, per_host: int = 4, min_per_host: int = 1):
+        self.per_host = max(1, per_host)
+        self.min_per_host = max(1, min(min_per_host, self.per_host))
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+        self._limits: Dict[str, int] = {}
+        self._pending_shrink: Dict[str, int] = {}
+        self._not_before: Dict[str, float] = {}
+
+    def _sem(self, host: str) -> asyncio.Semaphore:
+        sem = self._sems.get(host)
+        if sem is None:
+            sem = self._sems[host] = asyncio.Semaphore(self.per_host)
+            self._limits[host] = self.per_host
+            self._pending_shrink[host] = 0
+        return sem
+
+    async def wait(self, host: str):
+        """只等待该主机的退避期结束，不占用名额（并发上限由连接池负责时使用）。"""
+        wait = self._not_before.get(host, 0.0) - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        sem = self._sem(host)
+        await sem.acquire()
+        try:
+            await self.wait(host)
+            yield
+        finally:
+            # 名额收缩：归还时吞掉一个许可，而不是强行抢占正在使用的许可
+            if self._pending_shrink[host] > 0:
+                self._pending_shrink[host] -= 1
+            else:
+                sem.release()
+
+    def backoff(self, host: str, retry_after: Optional[str]) -> float:
+        """记录一次限流响应，返回调用方应等待的秒数。"""
+        delay = parse_retry_after(retry_after)
+        self._sem(host)
+        self._not_before[host] = max(self._not_before.get(host, 0.0), time.monotonic() + delay)
+        if self._limits[host] > self.min_per_host:
+            self._limits[host] -= 1
+            self._pending_shrink[host] += 1
+        return delay
+
+
+class DNSCache:
+    """进程内 DNS 缓存：host -> (地址列表, 过期时间)；同一主机的并发查询只发一次。"""
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._cache: Dict[str, Tuple[List[str], float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._resolver: Any = None
+
+    async def resolve(self, host: str) -> List[str]:
+        entry = self._cache.get(host)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        task = self._inflight.get(host)
+        if task is None:
+            task = asyncio.ensure_future(self._lookup(host))
+            self._inflight[host] = task
+            task.add_done_callback(lambda t, h=host: self._store(h, t))
+        # shield: 某个等待者被取消时不影响其它等待同一查询的任务
+        return await asyncio.shield(task)
+
+    async def warm(self, hosts: Iterable[str]) -> int:
+        """并发预解析全部主机，返回解析成功的数量；失败的主机留到真正连接时再报错。"""
+        names = [h for h in set(hosts) if h and not _is_ip(h)]
+        results = await asyncio.gather(*(self.resolve(h) for h in names), return_exceptions=True)
+        return sum(1 for r in results if not isinstance(r, BaseException))
+
+    def _store(self, host: str, task: asyncio.Future):
+        self._inflight.pop(host, None)
+        if not task.cancelled() and task.exception() is None:
+            self._cache[host] = (task.result(), time.monotonic() + self.ttl)
+
+    async def _lookup(self, host: str) -> List[str]:
+        if aiodns is not None:
+            try:
+                if self._resolver is None:
+                    self._resolver = aiodns.DNSResolver()
+                result = await self._resolver.gethostbyname(host, socket.AF_INET)
+                if result.addresses:
+                    return list(result.addresses)
+            except Exception:
+                pass  # 例如仅有 IPv6 记录，交给系统解析器
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+class CachingNetworkBackend(httpcore.AsyncNetworkBackend if httpcore is not None else object):  # type: ignore[misc]
+    """httpcore 网络后端包装：connect_tcp 前查 DNSCache，再按 IP 连接（TLS SNI 仍使用原主机名）。"""
+
+    def __init__(self, dns: DNSCache, backend: Any):
+        self._dns = dns
+        self._backend = backend
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        if _is_ip(host):
+            return await self._backend.connect_tcp(host, port, timeout=timeout, local_address=local_address, socket_options=socket_options)
+        try:
+            addresses = await self._dns.resolve(host)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        last_exc: Optional[Exception] = None
+        for ip in addresses:
+            try:
+                return await self._backend.connect_tcp(ip, port, timeout=timeout, local_address=local_address, socket_options=socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_exc = e
+        raise last_exc or httpcore.ConnectError(f"no addresses for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+def env_proxies_configured() -> bool:
+    """环境变量（HTTP_PROXY/HTTPS_PROXY/ALL_PROXY 等）或系统设置中是否配置了代理。"""
+    return bool(getproxies())
+
+
+def make_caching_transport(dns: DNSCache, **transport_kwargs: Any) -> Any:
+    """创建 httpx.AsyncHTTPTransport，并把连接池的网络后端换成带 DNS 缓存的版本。
+
+    注意：传入自定义 transport 后 httpx 不再按 trust_env 挂载环境变量里的代理，
+    配置了代理时（见 env_proxies_configured）应改用默认 client。
+    """
+    transport = httpx.AsyncHTTPTransport(**transport_kwargs)
+    pool = getattr(transport, '_pool', None)
+    # httpx 未公开 network_backend 参数，只能替换连接池属性；结构不符时保持默认行为
+    if httpcore is not None and pool is not None and hasattr(pool, '_network_backend'):
+        pool._network_backend = CachingNetworkBackend(dns, pool._network_backend)
+    return transport
+
+
+class CachingResolver(AbstractResolver if AbstractResolver is not None else object):  # type: ignore[misc]
+    """aiohttp 解析器：所有查询走 DNSCache，与 warm() 的预解析结果共享。"""
+
+    def __init__(self, dns: DNSCache):
+        self._dns = dns
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict[str, Any]]:
+        addresses = [host.strip('[]')] if _is_ip(host) else await self._dns.resolve(host)
+        results = []
+        for ip in addresses:
+            af = socket.AF_INET6 if ':' in ip else socket.AF_INET
+            if family not in (socket.AF_UNSPEC, af):
+                continue
+            results.append({'hostname': host, 'host': ip, 'port': port, 'family': af, 'proto': 0, 'flags': socket.AI_NUMERICHOST})
+        if not results:
+            raise OSError(f"no addresses for {host}")
+        return results
+
+    async def close(self):
+        pass
@@ -4,6 +4,7 @@
 运行此脚本来检查所有依赖是否正确安装和配置
 """
 
+import importlib.util
 import sys
 import os
 
@@ -18,6 +19,12 @@ def check_python_version():
         print(f"❌ Python {version.major}.{version.minor}.{version.micro} - 需要 Python 3.8 或更高版本")
         return False
 
+def _has_module(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
 def check_packages():
     """检查必要的包是否已安装"""
     print("\n🔍 检查必要的包...")
@@ -36,12 +43,15 @@ def check_packages():
         ("pandas", "pandas"),
     ]
     
+    # 只用 find_spec 查找模块，不执行模块代码（haystack、sentence_transformers 导入很慢）；
+    # 真正的导入只在 test_imports 中进行
+    found = [(pip_name, _has_module(package_name)) for package_name, pip_name in packages]
+
     success = True
-    for package_name, pip_name in packages:
-        try:
-            __import__(package_name)
+    for pip_name, installed in found:
+        if installed:
             print(f"✅ {pip_name} - 已安装")
-        except ImportError:
+        else:
             print(f"❌ {pip_name} - 未安装")
             print(f"   安装命令: pip install {pip_name}")
             success = False